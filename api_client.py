@@ -1,20 +1,71 @@
 
 import asyncio
-import json
+import hashlib
 import logging
+import random
 import time
 from dataclasses import dataclass
-from typing import Dict, Any, Optional, Tuple, List
+from typing import Dict, Any, Optional, Tuple
 
-from playwright.async_api import async_playwright, Page
-from config import API_BASE_URL, REQUEST_TIMEOUT_SEC
+import orjson
+from playwright.async_api import async_playwright, Browser, Page, Playwright, Route, Error as PlaywrightError
+from config import API_BASE_URL, REQUEST_TIMEOUT_SEC, FETCH_PARALLELISM
 
 logger = logging.getLogger(__name__)
 
+# Shared browser, launched lazily by _get_browser() and closed by close_browser()
+_playwright: Optional[Playwright] = None
+_browser: Optional[Browser] = None
+_browser_lock = asyncio.Lock()
+# Bounds how many forecasts are fetched concurrently (one page each) in the shared browser
+_page_sem = asyncio.Semaphore(FETCH_PARALLELISM)
+
 # Heuristics for "final" JSON in <pre>
 MIN_SUMMARY_LEN = 20  # Adapted to 20 as per recent context, or stick to provided 50? User script said 50. Let's start with 20 to be safe or 50 if user insists. User provided script says 50.
 MIN_SOURCES_LEN = 1
 
+# Reload policy
+MAX_RELOADS = 2
+LOADING_STUCK_SEC = 180
+RELOAD_BACKOFF_MAX_SEC = 30
+
+# Forecasts are reused across schedules with the same parameters for this long after they complete.
+# (countries, topics, language, time_horizon, depth) -> [task, expires_at]; expires_at is inf while in flight.
+FORECAST_CACHE_TTL_SEC = 300
+FORECAST_CACHE_MAXSIZE = 64
+_forecast_cache: Dict[Tuple[str, str, str, str, str], list] = {}
+
+# Installed as an init script so it is re-attached after every reload.
+# Only mutations inside a <pre>, or that add/remove one, wake the poller; spinners and other
+# page animation are ignored. Relevant mutations are coalesced so a streaming render results
+# in a handful of wakeups.
+_PRE_OBSERVER_JS = """
+(() => {
+  let pending = false;
+  const hasPre = (n) => n.nodeType === 1 && (n.nodeName === 'PRE' || n.querySelector('pre') !== null);
+  const touchesPre = (r) => {
+    const el = r.target.nodeType === 3 ? r.target.parentElement : r.target;
+    if (el && el.closest('pre')) return true;
+    for (const n of r.addedNodes) if (hasPre(n)) return true;
+    for (const n of r.removedNodes) if (hasPre(n)) return true;
+    return false;
+  };
+  new MutationObserver((records) => {
+    if (pending || !records.some(touchesPre)) return;
+    pending = true;
+    setTimeout(() => { pending = false; window.notifyPreChanged(); }, 50);
+  }).observe(document, { subtree: true, childList: true, characterData: true });
+})();
+"""
+
+# Raw-text signatures of the API key failure, in the casings the API emits.
+# Checked with plain `in` so the common no-error path never lowercases or walks the payload.
+_APIKEY_SIGS = ("API_KEY_INVALID", "api_key_invalid", "API key not valid", "api key not valid")
+
+# Requests not needed to render the report
+_BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font", "stylesheet"})
+_BLOCKED_HOSTS = ("googletagmanager.com", "google-analytics.com")
+
 @dataclass
 class Inspection:
     final_data: Optional[Dict[str, Any]] = None
@@ -37,34 +88,37 @@ def is_final_report(data: Any) -> Tuple[bool, str]:
     for i, item in enumerate(results):
         if not isinstance(item, dict):
             return False, f"results[{i}] not a dict"
+        _get = item.get
 
-        if item.get("error"):
+        if _get("error"):
             # Check if it is the specific known Google error, or just any error? 
             # The user logic handles 'error' field presence as invalid.
             return False, f"results[{i}] has error"
 
-        # Check Summary
-        summary = (item.get("summary") or "").strip()
-        if len(summary) < MIN_SUMMARY_LEN:
-            return False, f"results[{i}] summary too short ({len(summary)})"
-
-        # Check Sources
-        sources = item.get("sources")
+        # Check Sources (cheaper than the summary check, so it goes first)
+        sources = _get("sources")
         if not isinstance(sources, list) or len(sources) < MIN_SOURCES_LEN:
              # Some topics might validly have 0 sources if no news found? 
              # But user logic says strict check.
             return False, f"results[{i}] sources too few ({0 if not isinstance(sources, list) else len(sources)})"
-            
+
+        # Check Summary. strip() can only shrink, so skip it when already too short.
+        summary = _get("summary") or ""
+        if len(summary) < MIN_SUMMARY_LEN or len(summary.strip()) < MIN_SUMMARY_LEN:
+            return False, f"results[{i}] summary too short ({len(summary.strip())})"
+
         # Optional: Check Metadata Article Count
-        meta = item.get("metadata") or {}
+        meta = _get("metadata")
         if isinstance(meta, dict) and "articleCount" in meta:
-             try:
-                 if int(meta.get("articleCount") or 0) <= 0:
-                     return False, f"results[{i}] articleCount <= 0"
-             except: pass
+            ac = meta["articleCount"]
+            if not ac or (isinstance(ac, (int, float)) and ac <= 0):
+                return False, f"results[{i}] articleCount <= 0"
 
     return True, "ok"
 
+def _has_api_key_sig(text: str) -> bool:
+    return any(sig in text for sig in _APIKEY_SIGS)
+
 def _is_api_key_invalid_report(data: Any) -> bool:
     """
     Detects the specific "API key not valid / API_KEY_INVALID" failure.
@@ -84,12 +138,11 @@ def _is_api_key_invalid_report(data: Any) -> bool:
 
         # String signature
         if isinstance(err, str):
-            low = err.lower()
-            if "api key not valid" in low or "api_key_invalid" in low:
+            if _has_api_key_sig(err):
                 return True
             try:
-                err_obj = json.loads(err)
-            except:
+                err_obj = orjson.loads(err)
+            except orjson.JSONDecodeError:
                 err_obj = None
         else:
             # Already object?
@@ -97,9 +150,9 @@ def _is_api_key_invalid_report(data: Any) -> bool:
 
         if isinstance(err_obj, dict):
             e = err_obj.get("error") or {}
-            msg = (e.get("message") or "").lower()
+            msg = e.get("message") or ""
             status = (e.get("status") or "").upper()
-            if "api key not valid" in msg:
+            if _has_api_key_sig(msg):
                 return True
             if status in {"INVALID_ARGUMENT", "PERMISSION_DENIED"}:
                 details = e.get("details") or []
@@ -111,59 +164,84 @@ def _is_api_key_invalid_report(data: Any) -> bool:
                             return True
                         meta = d.get("metadata") or {}
                         for v in meta.values():
-                            if isinstance(v, str) and "api_key_invalid" in v.lower():
+                            if isinstance(v, str) and _has_api_key_sig(v):
                                 return True
     return False
 
-async def _read_pre_texts(page: Page) -> List[str]:
-    # Extract content of all pre tags
+async def _inspect_pres_js(page: Page) -> Dict[str, Any]:
+    # Classify all pre tags in a single roundtrip: loading flag + first JSON-looking candidate
     return await page.evaluate(
-        """() => Array.from(document.querySelectorAll('pre'))
-              .map(el => (el.textContent || '').trim())
-              .filter(t => t.length > 0)"""
+        """() => {
+              let loading = false, candidate = null;
+              for (const el of document.querySelectorAll('pre')) {
+                const t = (el.textContent || '').trim();
+                if (!t) continue;
+                if (t.toLowerCase().startsWith('loading analysis')) { loading = true; continue; }
+                if (candidate === null && t[0] === '{' && t.includes('"results"')) candidate = t;
+              }
+              return { loading, candidate };
+            }"""
     )
 
 async def inspect_page(page: Page) -> Inspection:
-    pre_texts = await _read_pre_texts(page)
-    loading_present = any(t.lower().startswith("loading analysis") for t in pre_texts)
+    pres = await _inspect_pres_js(page)
+    loading_present = pres["loading"]
+    t = pres["candidate"]
+    if t is None:
+        return Inspection(final_data=None, loading_present=loading_present)
 
-    for t in pre_texts:
-        if t.lower().startswith("loading analysis"):
-            continue
+    # Encoded once and shared by the digest and orjson
+    tb = t.encode()
 
-        # Basic JSON signature check
-        if not (t.startswith("{") and '"results"' in t):
-            continue
+    # Digest of the candidate as of the last inspection; unchanged text cannot change the verdict.
+    h = hashlib.blake2b(tb, digest_size=8).digest()
+    if getattr(page, "_pre_hash", None) == h:
+        return Inspection(final_data=None, loading_present=loading_present)
+    page._pre_hash = h
 
-        try:
-            data = json.loads(t)
-        except json.JSONDecodeError:
-            continue
+    if '"summary"' not in t and '"error"' not in t:
+        return Inspection(final_data=None, loading_present=loading_present)
+
+    # One orjson parse serves both checks; a partially rendered <pre> is simply not final yet
+    try:
+        data = orjson.loads(tb)
+    except orjson.JSONDecodeError:
+        return Inspection(final_data=None, loading_present=loading_present)
+
+    ok, reason = is_final_report(data)
+    if ok:
+        return Inspection(final_data=data, loading_present=loading_present) # found good data
+
+    # Check for specific failure patterns; only walk the report when a signature is present
+    if _has_api_key_sig(t) and _is_api_key_invalid_report(data):
+        return Inspection(final_data=None, loading_present=loading_present, api_key_invalid=True)
 
-        ok, reason = is_final_report(data)
-        if ok:
-            return Inspection(final_data=data, loading_present=loading_present) # found good data
-        
-        # Check for specific failure patterns
-        if _is_api_key_invalid_report(data):
-            return Inspection(final_data=None, loading_present=loading_present, api_key_invalid=True)
-            
     return Inspection(final_data=None, loading_present=loading_present)
 
 
+async def _block_heavy_resources(route: Route) -> None:
+    # Only the <pre> JSON matters; skip assets and trackers to speed up page loads
+    request = route.request
+    if request.resource_type in _BLOCKED_RESOURCE_TYPES or any(h in request.url for h in _BLOCKED_HOSTS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
 def with_cache_buster(url: str) -> str:
-    cb = int(time.time() * 1000)
-    if "#" in url:
-        base, frag = url.split("#", 1)
-        sep = "&" if "?" in base else "?"
-        return f"{base}{sep}cb={cb}#{frag}"
-    sep = "&" if "?" in url else "?"
-    return f"{url}{sep}cb={cb}"
+    cb = time.monotonic_ns() // 1_000_000
+    # partition() yields empty hash/frag for hash-less URLs, so one f-string covers both forms
+    base, hash_, frag = url.partition("#")
+    return f"{base}{'&' if '?' in base else '?'}cb={cb}{hash_}{frag}"
 
 
 async def reload_page(page: Page, reason: str, reload_no: int, url: str) -> None:
-    logger.warning(f"Reload #{reload_no}: reason='{reason}'. Sleeping 5s...")
-    await asyncio.sleep(5)
+    # Exponential backoff with jitter so concurrent fetches don't reload in lockstep
+    delay = min(RELOAD_BACKOFF_MAX_SEC, 5 * 2 ** (reload_no - 1)) + random.uniform(0, 1)
+    logger.warning(f"Reload #{reload_no}: reason='{reason}'. Sleeping {delay:.1f}s...")
+    await asyncio.sleep(delay)
+    # The reloaded page must be judged afresh, even if it renders the same failure again.
+    page._pre_hash = None
     
     try:
         await page.reload(wait_until="domcontentloaded", timeout=60000)
@@ -173,11 +251,87 @@ async def reload_page(page: Page, reason: str, reload_no: int, url: str) -> None
     
     try:
         await page.wait_for_selector("pre", timeout=20000)
-    except:
-        pass
+    except PlaywrightError as e:
+        logger.debug(f"No <pre> after reload: {e}")
 
 
-async def fetch_forecast(
+async def _poll_for_report(page: Page, url: str, pre_changed: asyncio.Event) -> Optional[Dict[str, Any]]:
+    """
+    Inspects the page whenever a DOM mutation is reported by the observer,
+    reloading on API_KEY_INVALID or when stuck on "Loading analysis".
+    """
+    # The event loop's monotonic clock; also immune to wall-clock jumps
+    loop = asyncio.get_running_loop()
+    phase_start = loop.time()
+    reloads_done = 0
+
+    while True:
+        pre_changed.clear()
+        insp = await inspect_page(page)
+
+        if insp.final_data:
+            logger.info("Successfully retrieved FINAL JSON.")
+            return insp.final_data
+
+        if insp.api_key_invalid:
+            if reloads_done < MAX_RELOADS:
+                reloads_done += 1
+                await reload_page(page, "API_KEY_INVALID detected", reloads_done, url)
+                phase_start = loop.time()
+                continue
+            else:
+                logger.error("API Error: API Key Invalid persisted after reloads.")
+                return None
+
+        phase_elapsed = loop.time() - phase_start
+        if insp.loading_present and phase_elapsed >= LOADING_STUCK_SEC:
+            if reloads_done < MAX_RELOADS:
+                reloads_done += 1
+                await reload_page(page, f"Stuck on Loading for {int(phase_elapsed)}s", reloads_done, url)
+                phase_start = loop.time()
+                continue
+
+        # Sleep until the next mutation, waking up in time for the stuck check.
+        wait_sec = LOADING_STUCK_SEC - phase_elapsed
+        if wait_sec <= 0:
+            wait_sec = LOADING_STUCK_SEC
+        try:
+            await asyncio.wait_for(pre_changed.wait(), timeout=wait_sec)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _get_browser() -> Browser:
+    """
+    Returns the shared headless Chromium, launching it on first use
+    (or again if it has crashed/disconnected since).
+    """
+    global _playwright, _browser
+    async with _browser_lock:
+        if _browser is None or not _browser.is_connected():
+            if _playwright is None:
+                _playwright = await async_playwright().start()
+            logger.info("Launching Headless Browser.")
+            _browser = await _playwright.chromium.launch(headless=True)
+        return _browser
+
+
+async def close_browser() -> None:
+    """Closes the shared browser and stops Playwright. Called on application shutdown."""
+    global _playwright, _browser
+    async with _browser_lock:
+        if _browser is not None:
+            try:
+                await _browser.close()
+            except Exception as e:
+                logger.warning(f"Browser close failed: {e}")
+            _browser = None
+        if _playwright is not None:
+            await _playwright.stop()
+            _playwright = None
+
+
+async def _fetch_forecast(
     countries: str,
     topics: str,
     language: str,
@@ -192,80 +346,98 @@ async def fetch_forecast(
     fragment = f"/news-json?countries={countries}&topics={topics}&language={language}&time_horizon={time_horizon}&depth={depth}"
     url = f"{base}/#{fragment}"
     
-    # Logic constants
-    MAX_RELOADS = 2
-    LOADING_STUCK_SEC = 180
-    
-    logger.info(f"Launching Headless Browser to fetch: {url}")
+    logger.info(f"Fetching with Headless Browser: {url}")
 
-    async with async_playwright() as p:
-        try:
-            browser = await p.chromium.launch(headless=True)
+    try:
+        browser = await _get_browser()
+        async with _page_sem:
+            # Fresh context per call keeps cookies/storage isolated while reusing the browser process
             context = await browser.new_context(
                 user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
             )
-            page = await context.new_page()
+            await context.route("**/*", _block_heavy_resources)
+            try:
+                page = await context.new_page()
             
-            # Setup console debugging
-            page.on("console", lambda msg: logger.debug(f"Console: {msg.text}"))
+                # Setup console debugging
+                page.on("console", lambda msg: logger.debug(f"Console: {msg.text}"))
+
+                # Wake the poller on DOM changes instead of sleeping between inspections.
+                # Bindings and init scripts survive reloads, so this is done once per page.
+                pre_changed = asyncio.Event()
+                await page.expose_binding("notifyPreChanged", lambda source: pre_changed.set())
+                await page.add_init_script(_PRE_OBSERVER_JS)
             
-            # Navigation
-            try:
-                await page.goto(url, wait_until="domcontentloaded", timeout=60000)
-            except Exception as e:
-                logger.error(f"Navigation failed: {e}")
-                return None
+                # Navigation
+                try:
+                    await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+                except Exception as e:
+                    logger.error(f"Navigation failed: {e}")
+                    return None
                 
-            # Initial wait for pre
-            try:
-                 await page.wait_for_selector("pre", timeout=20000)
-            except:
-                 logger.warning("No <pre> found quickly.")
+                # Initial wait for pre
+                try:
+                     await page.wait_for_selector("pre", timeout=20000)
+                except PlaywrightError:
+                     logger.warning("No <pre> found quickly.")
             
-            overall_start = time.time()
-            phase_start = overall_start
-            reloads_done = 0
-            
-            # Polling Loop
-            while True:
-                overall_elapsed = time.time() - overall_start
-                # Global timeout check
-                if overall_elapsed > (REQUEST_TIMEOUT_SEC + 60): # Give it slightly more than pure request timeout
+                try:
+                    # Give it slightly more than pure request timeout
+                    return await asyncio.wait_for(
+                        _poll_for_report(page, url, pre_changed),
+                        timeout=REQUEST_TIMEOUT_SEC + 60
+                    )
+                except asyncio.TimeoutError:
                     logger.error("Global fetch timeout exceeded.")
                     # debug screenshot
                     try: await page.screenshot(path="timeout_screenshot.png") 
-                    except: pass
+                    except PlaywrightError as e: logger.debug(f"Timeout screenshot failed: {e}")
                     return None
+            finally:
+                await context.close()
                 
-                insp = await inspect_page(page)
-                
-                if insp.final_data:
-                    logger.info("Successfully retrieved FINAL JSON.")
-                    return insp.final_data
-                
-                if insp.api_key_invalid:
-                    if reloads_done < MAX_RELOADS:
-                        reloads_done += 1
-                        await reload_page(page, "API_KEY_INVALID detected", reloads_done, url)
-                        phase_start = time.time()
-                        continue
-                    else:
-                        logger.error("API Error: API Key Invalid persisted after reloads.")
-                        return None
-                        
-                phase_elapsed = time.time() - phase_start
-                if insp.loading_present and phase_elapsed >= LOADING_STUCK_SEC:
-                    if reloads_done < MAX_RELOADS:
-                        reloads_done += 1
-                        await reload_page(page, f"Stuck on Loading for {int(phase_elapsed)}s", reloads_done, url)
-                        phase_start = time.time()
-                        continue
-                
-                # Wait before next poll
-                await asyncio.sleep(2)
-                
-        except Exception as e:
-            logger.error(f"Playwright Critical Error: {e}")
-            return None
+    except Exception as e:
+        logger.error(f"Playwright Critical Error: {e}")
+        return None
+
+
+async def fetch_forecast(
+    countries: str,
+    topics: str,
+    language: str,
+    time_horizon: str,
+    depth: str
+) -> Optional[Dict[str, Any]]:
+    """
+    Cached front for _fetch_forecast.
+    Concurrent and repeated calls with the same parameters share one fetch; failed fetches are not cached.
+    """
+    key = (countries, topics, language, time_horizon, depth)
+    loop = asyncio.get_running_loop()
+    now = loop.time()
+
+    entry = _forecast_cache.get(key)
+    if entry is None or entry[1] <= now:
+        for k in [k for k, e in _forecast_cache.items() if e[1] <= now]:
+            del _forecast_cache[k]
+        if len(_forecast_cache) >= FORECAST_CACHE_MAXSIZE:
+            # Dicts keep insertion order, so this evicts the oldest entry
+            del _forecast_cache[next(iter(_forecast_cache))]
+
+        task = asyncio.ensure_future(_fetch_forecast(*key))
+        entry = [task, float("inf")]
+        _forecast_cache[key] = entry
+
+        def _on_done(t: asyncio.Task):
+            if t.cancelled() or t.exception() is not None or t.result() is None:
+                if _forecast_cache.get(key) is entry:
+                    del _forecast_cache[key]
+            else:
+                entry[1] = loop.time() + FORECAST_CACHE_TTL_SEC
 
+        task.add_done_callback(_on_done)
+    else:
+        logger.info(f"Reusing cached forecast for {key}")
 
+    # Shielded so one cancelled caller doesn't cancel the fetch for the others
+    return await asyncio.shield(entry[0])
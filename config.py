@@ -1,16 +1,36 @@
 import os
-from dotenv import load_dotenv
+from typing import FrozenSet
 
-load_dotenv()
+# Only touch python-dotenv when there is a .env next to the code; in production the environment is set directly.
+# Resolved from this file rather than the working directory, so the bot can be started from anywhere.
+_DOTENV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+if os.path.exists(_DOTENV_PATH):
+    from dotenv import load_dotenv
+    load_dotenv(_DOTENV_PATH)
 
-BOT_TOKEN = os.getenv("BOT_TOKEN")
-API_BASE_URL = os.getenv("API_BASE_URL")
-SQLITE_PATH = os.getenv("SQLITE_PATH", "bot_database.db")
-ADMIN_IDS = [int(x.strip()) for x in os.getenv("ADMIN_IDS", "").split(",") if x.strip()]
-REQUEST_TIMEOUT_SEC = int(os.getenv("REQUEST_TIMEOUT_SEC", "60"))
+def _int_env(name: str, default: str, minimum: int = None) -> int:
+    raw = os.getenv(name, default)
+    try:
+        value = int(raw)
+    except ValueError:
+        raise RuntimeError(f"{name} must be an integer, got {raw!r}") from None
+    if minimum is not None and value < minimum:
+        raise RuntimeError(f"{name} must be at least {minimum}, got {value}")
+    return value
 
-# Validation
-if not BOT_TOKEN:
-    print("Warning: BOT_TOKEN is not set.")
-if not API_BASE_URL:
-    print("Warning: API_BASE_URL is not set.")
+def _required_env(name: str) -> str:
+    value = os.getenv(name)
+    if not value:
+        raise RuntimeError(f"{name} is not set.")
+    return value
+
+BOT_TOKEN: str = _required_env("BOT_TOKEN")
+API_BASE_URL: str = _required_env("API_BASE_URL")
+SQLITE_PATH: str = os.getenv("SQLITE_PATH", "bot_database.db")
+SCHEDULER_DB_URL: str = os.getenv("SCHEDULER_DB_URL", "sqlite:///jobs.sqlite")
+try:
+    ADMIN_IDS: FrozenSet[int] = frozenset(int(x) for x in os.getenv("ADMIN_IDS", "").split(",") if x.strip())
+except ValueError:
+    raise RuntimeError("ADMIN_IDS must be a comma-separated list of integers.") from None
+REQUEST_TIMEOUT_SEC: int = _int_env("REQUEST_TIMEOUT_SEC", "60")
+FETCH_PARALLELISM: int = _int_env("FETCH_PARALLELISM", "4", minimum=1)
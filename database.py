@@ -1,162 +1,214 @@
 import sqlite3
 import logging
+import threading
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import Iterator, List, Optional, Dict, Any
+from cachetools import TTLCache
 from config import SQLITE_PATH
 
 logger = logging.getLogger(__name__)
 
-def get_connection():
-    return sqlite3.connect(SQLITE_PATH)
+# A single long-lived connection is shared by all helpers instead of a connect/close per call.
+# _LOCK serializes access to it; `with _LOCK, conn:` additionally wraps writes in one transaction.
+_CONN: Optional[sqlite3.Connection] = None
+_LOCK = threading.RLock()
+
+# chat_id -> active for get_subscription_status; bounded, and entries expire after the TTL.
+# Entries are also dropped by every helper that changes a subscriber's active flag.
+_STATUS_TTL_SEC = 10
+_status_cache: TTLCache = TTLCache(maxsize=4096, ttl=_STATUS_TTL_SEC)
+
+# Explicit column order for schedule queries. Plain tuple rows are zipped into dicts,
+# skipping the intermediate sqlite3.Row objects.
+_SCHEDULE_COLUMNS = ("id", "enabled", "time_utc", "countries", "topics", "time_horizon", "depth", "language", "title")
+_SCHEDULE_SELECT = f"SELECT {', '.join(_SCHEDULE_COLUMNS)} FROM forecast_schedules"
+
+def get_connection() -> sqlite3.Connection:
+    global _CONN
+    with _LOCK:
+        if _CONN is None:
+            conn = sqlite3.connect(SQLITE_PATH, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            _CONN = conn
+        return _CONN
 
 def init_db():
     conn = get_connection()
-    c = conn.cursor()
-    
-    # Subscribers table
-    c.execute('''
-    CREATE TABLE IF NOT EXISTS subscribers (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        chat_id INTEGER UNIQUE NOT NULL,
-        user_id INTEGER,
-        created_at TEXT,
-        active INTEGER NOT NULL DEFAULT 1
-    )
-    ''')
-    
-    # Forecast Schedules table
-    c.execute('''
-    CREATE TABLE IF NOT EXISTS forecast_schedules (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        enabled INTEGER NOT NULL DEFAULT 1,
-        time_utc TEXT NOT NULL,
-        countries TEXT NOT NULL,
-        topics TEXT NOT NULL,
-        time_horizon TEXT NOT NULL,
-        depth TEXT NOT NULL,
-        language TEXT NOT NULL,
-        title TEXT
-    )
-    ''')
-    
-    # Schedule Runs table
-    c.execute('''
-    CREATE TABLE IF NOT EXISTS schedule_runs (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        schedule_id INTEGER NOT NULL,
-        run_date_utc TEXT NOT NULL,
-        run_time_utc TEXT NOT NULL,
-        started_at TEXT,
-        finished_at TEXT,
-        status TEXT NOT NULL,
-        error_text TEXT,
-        response_hash TEXT,
-        UNIQUE(schedule_id, run_date_utc, run_time_utc)
-    )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    with _LOCK, conn:
+        c = conn.cursor()
+
+        # Subscribers table
+        c.execute('''
+        CREATE TABLE IF NOT EXISTS subscribers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER UNIQUE NOT NULL,
+            user_id INTEGER,
+            created_at TEXT,
+            active INTEGER NOT NULL DEFAULT 1
+        )
+        ''')
+        # Partial covering index for the broadcast query (active chat_ids only)
+        c.execute('CREATE INDEX IF NOT EXISTS ix_sub_active_chat ON subscribers(chat_id) WHERE active = 1')
+
+        # Forecast Schedules table
+        c.execute('''
+        CREATE TABLE IF NOT EXISTS forecast_schedules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            enabled INTEGER NOT NULL DEFAULT 1,
+            time_utc TEXT NOT NULL,
+            countries TEXT NOT NULL,
+            topics TEXT NOT NULL,
+            time_horizon TEXT NOT NULL,
+            depth TEXT NOT NULL,
+            language TEXT NOT NULL,
+            title TEXT
+        )
+        ''')
+
+        # Schedule Runs table
+        # The UNIQUE constraint doubles as the (schedule_id, date, time) index used by should_run_schedule.
+        c.execute('''
+        CREATE TABLE IF NOT EXISTS schedule_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            schedule_id INTEGER NOT NULL,
+            run_date_utc TEXT NOT NULL,
+            run_time_utc TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT,
+            status TEXT NOT NULL,
+            error_text TEXT,
+            response_hash TEXT,
+            UNIQUE(schedule_id, run_date_utc, run_time_utc)
+        )
+        ''')
+
     logger.info("Database initialized.")
 
 # --- Subscriber Methods ---
 
 def add_subscriber(chat_id: int, user_id: Optional[int] = None) -> bool:
     """Returns True if new subscriber, False if already existed (reactivated)."""
+    _status_cache.pop(chat_id, None)
     conn = get_connection()
-    c = conn.cursor()
-    try:
+    with _LOCK, conn:
+        c = conn.cursor()
         c.execute('SELECT id, active FROM subscribers WHERE chat_id = ?', (chat_id,))
         row = c.fetchone()
-        
+
         if row:
             # Already exists
             if row[1] == 0:
                 c.execute('UPDATE subscribers SET active = 1 WHERE id = ?', (row[0],))
-                conn.commit()
                 return True # Reactivated
             return False # Already active
         else:
             now = datetime.utcnow().isoformat()
             c.execute('INSERT INTO subscribers (chat_id, user_id, created_at, active) VALUES (?, ?, ?, 1)',
                       (chat_id, user_id, now))
-            conn.commit()
             return True
-    finally:
-        conn.close()
 
 def unsubscribe_user(chat_id: int):
+    _status_cache.pop(chat_id, None)
+    conn = get_connection()
+    with _LOCK, conn:
+        conn.execute('UPDATE subscribers SET active = 0 WHERE chat_id = ?', (chat_id,))
+
+def bulk_unsubscribe(chat_ids: List[int]):
+    """Deactivates many subscribers by chat_id in one transaction."""
+    if not chat_ids:
+        return
+    for chat_id in chat_ids:
+        _status_cache.pop(chat_id, None)
     conn = get_connection()
-    c = conn.cursor()
-    c.execute('UPDATE subscribers SET active = 0 WHERE chat_id = ?', (chat_id,))
-    conn.commit()
-    conn.close()
+    with _LOCK, conn:
+        # Chunked to stay well below SQLite's bound-parameter limit
+        for i in range(0, len(chat_ids), 500):
+            batch = chat_ids[i:i + 500]
+            conn.execute(
+                f"UPDATE subscribers SET active = 0 WHERE chat_id IN ({','.join('?' * len(batch))})",
+                batch
+            )
 
 def deactivate_subscriber_by_id(sub_id: int):
+    deactivate_subscribers_by_ids([sub_id])
+
+def deactivate_subscribers_by_ids(sub_ids: List[int]):
+    """Deactivates many subscribers in one transaction."""
+    if not sub_ids:
+        return
+    # Keyed by row id, not chat_id, so the affected cache entries are unknown
+    _status_cache.clear()
     conn = get_connection()
-    c = conn.cursor()
-    c.execute('UPDATE subscribers SET active = 0 WHERE id = ?', (sub_id,))
-    conn.commit()
-    conn.close()
+    with _LOCK, conn:
+        conn.executemany('UPDATE subscribers SET active = 0 WHERE id = ?', [(i,) for i in sub_ids])
 
-def get_active_subscribers_chat_ids() -> List[int]:
+def iter_active_subscribers(batch_size: int = 500) -> Iterator[int]:
+    """
+    Yields active chat_ids, fetching from the cursor in batches rather than materializing all rows.
+    The lock is only held while a batch is fetched.
+    """
     conn = get_connection()
-    c = conn.cursor()
-    c.execute('SELECT chat_id FROM subscribers WHERE active = 1')
-    rows = c.fetchall()
-    conn.close()
-    return [r[0] for r in rows]
+    with _LOCK:
+        c = conn.execute('SELECT chat_id FROM subscribers WHERE active = 1')
+    while True:
+        with _LOCK:
+            rows = c.fetchmany(batch_size)
+        if not rows:
+            return
+        for r in rows:
+            yield r[0]
 
 def get_subscriber_count() -> int:
     conn = get_connection()
-    c = conn.cursor()
-    c.execute('SELECT COUNT(*) FROM subscribers WHERE active = 1')
-    res = c.fetchone()[0]
-    conn.close()
-    return res
+    with _LOCK:
+        return conn.execute('SELECT COUNT(*) FROM subscribers WHERE active = 1').fetchone()[0]
 
 def get_subscription_status(chat_id: int) -> bool:
+    cached = _status_cache.get(chat_id)
+    if cached is not None:
+        return cached
+
     conn = get_connection()
-    c = conn.cursor()
-    c.execute('SELECT active FROM subscribers WHERE chat_id = ?', (chat_id,))
-    row = c.fetchone()
-    conn.close()
-    if row and row[0] == 1:
-        return True
-    return False
+    with _LOCK:
+        row = conn.execute('SELECT active FROM subscribers WHERE chat_id = ?', (chat_id,)).fetchone()
+    active = bool(row and row[0] == 1)
+    _status_cache[chat_id] = active
+    return active
 
 # --- Schedule Methods ---
 
+def _schedule_dicts(rows: List[tuple]) -> List[Dict[str, Any]]:
+    return [dict(zip(_SCHEDULE_COLUMNS, r)) for r in rows]
+
 def get_all_schedules() -> List[Dict[str, Any]]:
     conn = get_connection()
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute('SELECT * FROM forecast_schedules')
-    rows = c.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+    with _LOCK:
+        rows = conn.execute(_SCHEDULE_SELECT).fetchall()
+    return _schedule_dicts(rows)
 
 def get_enabled_schedules() -> List[Dict[str, Any]]:
     conn = get_connection()
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute('SELECT * FROM forecast_schedules WHERE enabled = 1')
-    rows = c.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+    with _LOCK:
+        rows = conn.execute(f'{_SCHEDULE_SELECT} WHERE enabled = 1').fetchall()
+    return _schedule_dicts(rows)
+
+def get_schedule_by_id(schedule_id: int) -> Optional[Dict[str, Any]]:
+    conn = get_connection()
+    with _LOCK:
+        row = conn.execute(f'{_SCHEDULE_SELECT} WHERE id = ?', (schedule_id,)).fetchone()
+    return dict(zip(_SCHEDULE_COLUMNS, row)) if row else None
 
 def add_schedule(time_utc, countries, topics, time_horizon, depth, language, title=None):
     conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        INSERT INTO forecast_schedules 
-        (enabled, time_utc, countries, topics, time_horizon, depth, language, title)
-        VALUES (1, ?, ?, ?, ?, ?, ?, ?)
-    ''', (time_utc, countries, topics, time_horizon, depth, language, title))
-    conn.commit()
-    new_id = c.lastrowid
-    conn.close()
-    return new_id
+    with _LOCK, conn:
+        c = conn.cursor()
+        c.execute('''
+            INSERT INTO forecast_schedules
+            (enabled, time_utc, countries, topics, time_horizon, depth, language, title)
+            VALUES (1, ?, ?, ?, ?, ?, ?, ?)
+        ''', (time_utc, countries, topics, time_horizon, depth, language, title))
+        return c.lastrowid
 
 # --- Run History Methods ---
 
@@ -166,51 +218,40 @@ def should_run_schedule(schedule_id: int, date_utc: str, time_utc: str) -> bool:
     Returns True if it SHOULD run (no completion record found).
     """
     conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        SELECT status FROM schedule_runs 
-        WHERE schedule_id = ? AND run_date_utc = ? AND run_time_utc = ?
-    ''', (schedule_id, date_utc, time_utc))
-    row = c.fetchone()
-    conn.close()
-    
+    with _LOCK:
+        row = conn.execute('''
+            SELECT status FROM schedule_runs
+            WHERE schedule_id = ? AND run_date_utc = ? AND run_time_utc = ?
+        ''', (schedule_id, date_utc, time_utc)).fetchone()
+
     if row:
         status = row[0]
         if status in ('success', 'partial'):
             return False
     return True
 
-def start_run_record(schedule_id: int, date_utc: str, time_utc: str) -> Optional[int]:
+def claim_run_slot(schedule_id: int, date_utc: str, time_utc: str) -> Optional[int]:
     """
-    Creates a 'running' or initial record if not exists.
-    Returns record ID.
-    If fails (unique constraint), probably means another process started it or it's done. 
-    But since we check `should_run_schedule` first, this serves as a lock attempt.
+    Atomically creates the 'running' record for this slot and returns its ID.
+    Returns None if the slot already has a record (finished, failed or claimed concurrently);
+    use `should_run_schedule` to tell those apart if needed.
     """
     conn = get_connection()
-    c = conn.cursor()
-    try:
+    with _LOCK, conn:
         now = datetime.utcnow().isoformat()
-        c.execute('''
-            INSERT INTO schedule_runs (schedule_id, run_date_utc, run_time_utc, started_at, status)
+        # INSERT OR IGNORE rather than ON CONFLICT ... RETURNING, which needs SQLite 3.35+
+        c = conn.execute('''
+            INSERT OR IGNORE INTO schedule_runs (schedule_id, run_date_utc, run_time_utc, started_at, status)
             VALUES (?, ?, ?, ?, 'running')
         ''', (schedule_id, date_utc, time_utc, now))
-        conn.commit()
-        return c.lastrowid
-    except sqlite3.IntegrityError:
-        # Already exists
-        return None
-    finally:
-        conn.close()
+    return c.lastrowid if c.rowcount == 1 else None
 
 def update_run_result(run_id: int, status: str, error_text: str = None, response_hash: str = None):
     conn = get_connection()
-    c = conn.cursor()
-    now = datetime.utcnow().isoformat()
-    c.execute('''
-        UPDATE schedule_runs 
-        SET finished_at = ?, status = ?, error_text = ?, response_hash = ?
-        WHERE id = ?
-    ''', (now, status, error_text, response_hash, run_id))
-    conn.commit()
-    conn.close()
+    with _LOCK, conn:
+        now = datetime.utcnow().isoformat()
+        conn.execute('''
+            UPDATE schedule_runs
+            SET finished_at = ?, status = ?, error_text = ?, response_hash = ?
+            WHERE id = ?
+        ''', (now, status, error_text, response_hash, run_id))
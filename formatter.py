@@ -1,20 +1,44 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
 
 MAX_MESSAGE_LENGTH = 4096
 
+# Single-pass replacement table for escape_html
+_HTML_ESC_TABLE = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+# Static section headers
+_NARRATIVE_HEADER = "<b>Narrative Comparison:</b>"
+_SOURCES_HEADER = "<b>Sources:</b>"
+_SOURCES_DISPLAY_COUNT = 5
+_TOPIC_SEPARATOR = "\n\n"
+
+# id(data) -> (data, messages) for format_forecast_results.
+# Cached forecasts are shared between schedules, so the same dict is often formatted repeatedly.
+# The dict itself is kept so its id can't be reused while the entry exists.
+_FORMAT_CACHE_MAXSIZE = 64
+_format_cache: Dict[int, Tuple[Dict[str, Any], List[str]]] = {}
+
+# Sentiment label per integer display score 0-100: < 40 Negative, > 60 Positive, else Neutral.
+# Non-integer scores use the same comparisons directly.
+_SENT_LABELS = tuple(
+    "Negative" if s < 40 else "Positive" if s > 60 else "Neutral"
+    for s in range(101)
+)
+
 def escape_html(text: str) -> str:
     if not text:
         return ""
-    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return text.translate(_HTML_ESC_TABLE)
 
 def format_sentiment(score: float, normalized_score: float = None) -> str:
     # Assuming score 0-100
-    label = "Neutral"
-    if score > 60:
+    if isinstance(score, int):
+        label = _SENT_LABELS[100 if score >= 100 else max(0, score)]
+    elif score > 60:
         label = "Positive"
     elif score < 40:
         label = "Negative"
-        
+    else:
+        label = "Neutral"
     return f"{score} ({label})"
 
 def chunk_text(text: str, limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
@@ -25,28 +49,59 @@ def chunk_text(text: str, limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
     if len(text) <= limit:
         return [text]
     
+    # Work with indices into the original string; only the emitted chunks are sliced.
     chunks = []
-    while text:
-        if len(text) <= limit:
-            chunks.append(text)
+    start = 0
+    n = len(text)
+    while start < n:
+        end = start + limit
+        if end >= n:
+            chunks.append(text[start:])
             break
             
         # Try to find a newline near the limit
-        split_at = text.rfind('\n', 0, limit)
-        if split_at == -1:
-            split_at = limit
+        split_at = text.rfind('\n', start, end)
+        if split_at <= start:
+            split_at = end
             
-        chunk = text[:split_at]
-        chunks.append(chunk)
-        text = text[split_at:].strip()
+        chunks.append(text[start:split_at])
+        
+        # Skip the separator (and blank lines) so the next chunk doesn't start with whitespace
+        start = split_at
+        while start < n and text[start].isspace():
+            start += 1
         
     return chunks
 
+def pack_messages(messages: List[str], limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """
+    Greedily concatenates consecutive messages while the result stays within the limit,
+    so a briefing goes out in as few sends as possible. Order is preserved.
+    """
+    packed: List[str] = []
+    for msg in messages:
+        if packed and len(packed[-1]) + len(_TOPIC_SEPARATOR) + len(msg) <= limit:
+            packed[-1] = f"{packed[-1]}{_TOPIC_SEPARATOR}{msg}"
+        else:
+            packed.append(msg)
+    return packed
+
 def format_forecast_results(data: Dict[str, Any]) -> List[str]:
     """
     Returns a list of messages to send.
-    Usually each string in the list is a full topic message.
+    Topics are packed together into as few messages as fit the Telegram limit.
+    Results are memoized per data object; callers must not mutate either.
     """
+    cached = _format_cache.get(id(data))
+    if cached and cached[0] is data:
+        return cached[1]
+    messages = _format_forecast_results(data)
+    if len(_format_cache) >= _FORMAT_CACHE_MAXSIZE:
+        del _format_cache[next(iter(_format_cache))]
+    _format_cache[id(data)] = (data, messages)
+    return messages
+
+def _format_forecast_results(data: Dict[str, Any]) -> List[str]:
     results = data.get("results", [])
     if not results:
         return ["No significant news found for these parameters."]
@@ -63,6 +118,7 @@ def format_forecast_results(data: Dict[str, Any]) -> List[str]:
 
     for item in results:
         msg_parts = []
+        append = msg_parts.append
         
         topic = escape_html(item.get("topic", "Unknown Topic"))
         summary = escape_html(item.get("summary", ""))
@@ -76,36 +132,35 @@ def format_forecast_results(data: Dict[str, Any]) -> List[str]:
         sentiment_str = format_sentiment(sentiment_display)
         
         # Header
-        msg_parts.append(f"<b>{topic}</b>")
-        msg_parts.append(f"<i>Context: {countries} | {time_horizon} | {output_mode}</i>")
-        msg_parts.append(f"<b>Sentiment:</b> {sentiment_str}")
-        msg_parts.append("")
-        msg_parts.append(summary)
+        append(f"<b>{topic}</b>")
+        append(f"<i>Context: {countries} | {time_horizon} | {output_mode}</i>")
+        append(f"<b>Sentiment:</b> {sentiment_str}")
+        append("")
+        append(summary)
         
         # Narrative Comparison
         convergence = item.get("convergenceAnalysis")
         if convergence:
-            msg_parts.append("")
-            msg_parts.append("<b>Narrative Comparison:</b>")
-            msg_parts.append(escape_html(convergence))
+            append("")
+            append(_NARRATIVE_HEADER)
+            append(escape_html(convergence))
             
         # Sources
         sources = item.get("sources", [])
         if sources:
-            msg_parts.append("")
-            msg_parts.append("<b>Sources:</b>")
+            append("")
+            append(_SOURCES_HEADER)
             
-            display_count = 5
-            for i, src in enumerate(sources[:display_count]):
+            for i, src in enumerate(sources[:_SOURCES_DISPLAY_COUNT], 1):
                 name = escape_html(src.get("name", "Source"))
                 url = src.get("url", "")
                 if url:
-                    msg_parts.append(f"{i+1}. <a href=\"{url}\">{name}</a>")
+                    append(f"{i}. <a href=\"{url}\">{name}</a>")
                 else:
-                    msg_parts.append(f"{i+1}. {name}")
+                    append(f"{i}. {name}")
             
-            if len(sources) > display_count:
-                msg_parts.append(f"<i>+{len(sources) - display_count} more sources</i>")
+            if len(sources) > _SOURCES_DISPLAY_COUNT:
+                append(f"<i>+{len(sources) - _SOURCES_DISPLAY_COUNT} more sources</i>")
                 
         # Join
         full_msg = "\n".join(msg_parts)
@@ -122,4 +177,4 @@ def format_forecast_results(data: Dict[str, Any]) -> List[str]:
         else:
             messages.append(full_msg)
             
-    return messages
+    return pack_messages(messages)
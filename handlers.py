@@ -2,6 +2,7 @@ from telegram import Update
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 import database as db
+from subscribers import active_subscribers
 from config import ADMIN_IDS
 import logging
 
@@ -23,7 +24,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def subscribe(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     user_id = update.effective_user.id
-    is_new = db.add_subscriber(chat_id, user_id)
+    is_new = active_subscribers.add(chat_id, user_id)
     if is_new:
         await update.message.reply_text("✅ You are now subscribed!")
     else:
@@ -31,7 +32,7 @@ async def subscribe(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def unsubscribe(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
-    db.unsubscribe_user(chat_id)
+    active_subscribers.remove(chat_id)
     await update.message.reply_text("❌ Unsubscribed. You will no longer receive forecasts.")
 
 async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -89,10 +90,16 @@ async def run_now(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
         
         schedule_id = int(args[0])
-        await update.message.reply_text(f"🚀 Triggering Schedule ID {schedule_id} manually...")
         
         # dynamic import to avoid circular dependency
-        from scheduler_service import execute_schedule
+        from scheduler_service import execute_schedule, get_schedule
+        
+        schedule = get_schedule(schedule_id)
+        if not schedule:
+            await update.message.reply_text("Error: Schedule ID not found.")
+            return
+        
+        await update.message.reply_text(f"🚀 Triggering Schedule ID {schedule_id} manually...")
         
         # force=True might be needed if we want to bypass checks, 
         # but user requirement says: /run_now runs immediately (by default send to admin; optional flag to send to all)
@@ -103,7 +110,7 @@ async def run_now(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Let's assume standard behavior for now to meet core logic: execute the job.
         
         # Using create_task to run async
-        context.application.create_task(execute_schedule(context.bot, schedule_id, manual_trigger=True, admin_user_id=user_id))
+        context.application.create_task(execute_schedule(context.bot, schedule, manual_trigger=True, admin_user_id=user_id))
         
     except ValueError:
         await update.message.reply_text("Invalid ID.")
@@ -1,12 +1,15 @@
 import logging
 import asyncio
 from telegram.ext import ApplicationBuilder, CommandHandler, Application
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
+import api_client
 import config
 import database as db
 import handlers
 import scheduler_service
+from subscribers import active_subscribers
 
 # Logging setup
 logging.basicConfig(
@@ -33,26 +36,44 @@ async def post_init(application: Application):
     """
     Initializes and starts the scheduler after the bot's event loop is running.
     """
-    scheduler = AsyncIOScheduler()
+    active_subscribers.load()
+
+    # Persistent jobstore: jobs survive restarts and setup_scheduler only reconciles differences.
+    # coalesce collapses fires missed while the bot was down into a single run.
+    scheduler = AsyncIOScheduler(
+        jobstores={"default": SQLAlchemyJobStore(url=config.SCHEDULER_DB_URL)},
+        job_defaults={"coalesce": True, "misfire_grace_time": 3600}
+    )
     # Attach to application.bot_data to ensure persistence (avoid GC) and avoid AttributeError
     application.bot_data["scheduler"] = scheduler
     
+    # Start paused so the stored jobs are loaded for reconciliation but nothing fires yet
+    scheduler.start(paused=True)
     scheduler_service.setup_scheduler(application, scheduler)
-    scheduler.start()
+    scheduler.resume()
     logger.info("APScheduler started via post_init hook.")
 
+async def post_shutdown(application: Application):
+    """
+    Releases the shared headless browser used by api_client.
+    """
+    await api_client.close_browser()
+
 def main():
+    # Run on uvloop where available (not on Windows). run_polling picks up the current event loop.
+    try:
+        import uvloop
+        asyncio.set_event_loop(uvloop.new_event_loop())
+    except ImportError:
+        logger.info("uvloop not installed; using the default asyncio event loop.")
+
     # 1. Initialize Database
     db.init_db()
     seed_default_schedule_if_empty()
 
     # 2. Build Telegram Application
-    if not config.BOT_TOKEN:
-        logger.error("BOT_TOKEN not found in environment variables.")
-        return
-
     # post_init is used to start the scheduler inside the asyncio loop
-    application = ApplicationBuilder().token(config.BOT_TOKEN).post_init(post_init).build()
+    application = ApplicationBuilder().token(config.BOT_TOKEN).post_init(post_init).post_shutdown(post_shutdown).build()
 
     # 3. Register Handlers
     application.add_handler(CommandHandler("start", handlers.start))
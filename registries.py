@@ -1,4 +1,5 @@
-from typing import Dict, List, Optional
+import sys
+from typing import Dict, FrozenSet, Optional
 
 COUNTRY_REGISTRY: Dict[str, str] = {
     "al": "Albania", "ad": "Andorra", "at": "Austria", "by": "Belarus", "be": "Belgium",
@@ -13,9 +14,16 @@ COUNTRY_REGISTRY: Dict[str, str] = {
     "ua": "Ukraine", "uk": "United Kingdom", "gb": "United Kingdom"
 }
 
-SUPPORTED_LANGUAGES: List[str] = [
+# Plain hash set of valid codes for membership tests
+_COUNTRY_KEYS = frozenset(map(sys.intern, COUNTRY_REGISTRY))
+
+SUPPORTED_LANGUAGES: FrozenSet[str] = frozenset(map(sys.intern, [
     "en", "pt", "es", "fr", "de", "it", "ru", "pl", "uk"
-]
+]))
+
+SUPPORTED_DEPTHS: FrozenSet[str] = frozenset(map(sys.intern, ["fast", "standard", "extended"]))
+
+SUPPORTED_TIME_HORIZONS: FrozenSet[str] = frozenset(map(sys.intern, ["24h", "3d", "7d"]))
 
 def normalize_country_code(code: str) -> Optional[str]:
     """
@@ -24,7 +32,7 @@ def normalize_country_code(code: str) -> Optional[str]:
     Returns None if invalid.
     """
     code = code.lower().strip()
-    if code not in COUNTRY_REGISTRY:
+    if code not in _COUNTRY_KEYS:
         return None
     if code == "gb":
         return "uk"
@@ -35,7 +43,7 @@ def validate_language(lang: str) -> bool:
     return lang.lower().strip() in SUPPORTED_LANGUAGES
 
 def validate_depth(depth: str) -> bool:
-    return depth in ["fast", "standard", "extended"]
+    return depth in SUPPORTED_DEPTHS
 
 def validate_time_horizon(horizon: str) -> bool:
-    return horizon in ["24h", "3d", "7d"]
+    return horizon in SUPPORTED_TIME_HORIZONS
@@ -1,31 +1,141 @@
 import asyncio
+import functools
 import logging
 from datetime import datetime, date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from aiolimiter import AsyncLimiter
+from cachetools import TTLCache
 from telegram import Bot
 from telegram.error import Forbidden, RetryAfter
 import database as db
 import api_client
 import formatter
 import registries
+from subscribers import active_subscribers
 from config import ADMIN_IDS
 
 logger = logging.getLogger(__name__)
 
-async def execute_schedule(bot: Bot, schedule_id: int, manual_trigger: bool = False, admin_user_id: int = None, target_all: bool = False):
+# Bot and scheduler used by persistent scheduler jobs; set in setup_scheduler
+_bot: Optional[Bot] = None
+_scheduler: Optional[AsyncIOScheduler] = None
+
+# Number of broadcast workers, i.e. recipients being sent to at once (Telegram allows ~30 msg/s per bot)
+BROADCAST_CONCURRENCY = 25
+# Token bucket shared by all broadcasts, slightly under Telegram's global 30 msg/s.
+# Sends go out in bursts and only wait when the bucket is actually empty.
+_tg_limiter = AsyncLimiter(28, 1)
+# Identical for every broadcast message; built once instead of per call
+_SEND_KWARGS = {"parse_mode": "HTML", "disable_web_page_preview": True}
+
+# How often schedules edited directly in the DB are re-synced with the scheduler's jobs
+SCHEDULE_RECONCILE_SEC = 60
+
+# schedule_id -> schedule row for on-demand lookups (/run_now), so edits reach /run_now within the TTL.
+# Scheduled fires re-read their row and store it here; setup_scheduler clears it on startup.
+_schedule_cache: TTLCache = TTLCache(maxsize=256, ttl=60)
+
+def invalidate_schedule_cache(schedule_id: int = None):
+    if schedule_id is None:
+        _schedule_cache.clear()
+    else:
+        _schedule_cache.pop(schedule_id, None)
+
+def get_schedule(schedule_id: int) -> Optional[Dict[str, Any]]:
+    schedule = _schedule_cache.get(schedule_id)
+    if schedule is None:
+        schedule = db.get_schedule_by_id(schedule_id)
+        if schedule:
+            _schedule_cache[schedule_id] = schedule
+    return schedule
+
+@functools.lru_cache(maxsize=512)
+def _parse_countries(raw: str) -> Tuple[Optional[str], str]:
+    """
+    Validates a schedule's countries CSV. Returns (error, normalized_csv).
+    Memoized by the raw string since a schedule's countries rarely change.
+    """
+    valid_countries = []
+    for c in raw.split(','):
+        c = c.strip()
+        norm = registries.normalize_country_code(c)
+        if norm:
+            valid_countries.append(norm)
+        else:
+            # We can either fail partially or strictly. Prompt: "every country code... must exist"
+            return f"Invalid country code: {c}", ""
+    return None, ",".join(valid_countries)
+
+async def _notify_admins(bot: Bot, text: str):
+    """Sends text to all admins concurrently; failures are logged, never raised."""
+    admin_ids = list(ADMIN_IDS)
+    results = await asyncio.gather(
+        *(bot.send_message(aid, text) for aid in admin_ids),
+        return_exceptions=True
+    )
+    for aid, res in zip(admin_ids, results):
+        if isinstance(res, Exception):
+            logger.warning(f"Failed to notify admin {aid}: {res}")
+
+async def _send_one(bot: Bot, chat_id: int, messages: List[str], blocked: List[int]) -> bool:
+    """
+    Sends all messages to one recipient. Returns True if every message was delivered.
+    On RetryAfter it sleeps and retries the failed message once.
+    Recipients that blocked the bot are appended to `blocked` for a bulk unsubscribe.
+    """
+    retried = False
+    i = 0
+    while i < len(messages):
+        try:
+            async with _tg_limiter:
+                await bot.send_message(chat_id, messages[i], **_SEND_KWARGS)
+            i += 1
+        except Forbidden:
+            # User blocked bot
+            logger.info(f"User {chat_id} blocked bot. Deactivating.")
+            blocked.append(chat_id)
+            return False
+        except RetryAfter as e:
+            if retried:
+                logger.warning(f"Rate limited again for {chat_id}. Skipping.")
+                return False
+            logger.warning(f"Rate limited. Sleeping {e.retry_after}s")
+            await asyncio.sleep(e.retry_after)
+            retried = True
+        except Exception as e:
+            logger.error(f"Error sending to {chat_id}: {e}")
+            return False
+    return True
+
+async def _broadcast(bot: Bot, recipients: Iterable[int], messages: List[str]) -> Tuple[int, List[int]]:
+    """
+    Sends messages to all recipients using BROADCAST_CONCURRENCY workers that pull from
+    one shared iterator, so recipients are consumed as they come instead of all being
+    turned into pending coroutines up front. Returns (success_count, blocked_chat_ids).
+    """
+    it = iter(recipients)
+    blocked: List[int] = []
+    success_count = 0
+
+    async def worker():
+        nonlocal success_count
+        for chat_id in it:
+            if await _send_one(bot, chat_id, messages, blocked):
+                success_count += 1
+
+    await asyncio.gather(*(worker() for _ in range(BROADCAST_CONCURRENCY)))
+    return success_count, blocked
+
+async def execute_schedule(bot: Bot, schedule: Dict[str, Any], manual_trigger: bool = False, admin_user_id: int = None, target_all: bool = False):
     """
     Executes a forecast schedule: fetches data and sends to subscribers.
+    `schedule` is the schedule row; scheduled jobs pass the row as re-read at fire time.
     """
-    # 1. Load Schedule details
-    schedules = db.get_all_schedules()
-    schedule = next((s for s in schedules if s['id'] == schedule_id), None)
-    
-    if not schedule:
-        logger.error(f"Schedule {schedule_id} not found.")
-        if manual_trigger and admin_user_id:
-            await bot.send_message(admin_user_id, "Error: Schedule ID not found.")
-        return
+    # 1. Schedule details
+    schedule_id = schedule['id']
 
     # 2. Determine Targets
     if manual_trigger and not target_all:
@@ -34,7 +144,7 @@ async def execute_schedule(bot: Bot, schedule_id: int, manual_trigger: bool = Fa
         logger.info(f"Manual run for Schedule {schedule_id}, sending to admin {admin_user_id}")
     else:
         # Standard run or Manual 'all'
-        recipients = db.get_active_subscribers_chat_ids()
+        recipients = list(active_subscribers.ids)
         logger.info(f"Run for Schedule {schedule_id}, sending to {len(recipients)} subscribers")
 
     if not recipients:
@@ -43,18 +153,17 @@ async def execute_schedule(bot: Bot, schedule_id: int, manual_trigger: bool = Fa
 
     # 3. Check Persistence (Deduplication) - ONLY for scheduled runs
     now_utc = datetime.utcnow()
-    date_str = now_utc.strftime("%Y-%m-%d")
+    date_str = f"{now_utc.year:04d}-{now_utc.month:02d}-{now_utc.day:02d}" # same as strftime("%Y-%m-%d"), without the locale-aware path
     time_str = schedule['time_utc'] # HH:MM
     
     run_id = None
     if not manual_trigger:
-        if not db.should_run_schedule(schedule_id, date_str, time_str):
-            logger.info(f"Schedule {schedule_id} already ran for {date_str} {time_str}. Skipping.")
-            return
-
-        run_id = db.start_run_record(schedule_id, date_str, time_str)
+        run_id = db.claim_run_slot(schedule_id, date_str, time_str)
         if run_id is None:
-            logger.info(f"Could not lock run for schedule {schedule_id}. Race condition or already exists.")
+            if not db.should_run_schedule(schedule_id, date_str, time_str):
+                logger.info(f"Schedule {schedule_id} already ran for {date_str} {time_str}. Skipping.")
+            else:
+                logger.info(f"Could not lock run for schedule {schedule_id}. Race condition or already exists.")
             return
 
     # Validation (Post-Lock)
@@ -66,17 +175,9 @@ async def execute_schedule(bot: Bot, schedule_id: int, manual_trigger: bool = Fa
         validation_error = f"Invalid language: {schedule['language']}"
 
     # 2. Countries
-    raw_countries = [c.strip() for c in schedule['countries'].split(',')]
-    valid_countries = []
+    countries_str = ""
     if not validation_error:
-        for c in raw_countries:
-            norm = registries.normalize_country_code(c)
-            if norm:
-                valid_countries.append(norm)
-            else:
-                # We can either fail partially or strictly. Prompt: "every country code... must exist"
-                validation_error = f"Invalid country code: {c}"
-                break
+        validation_error, countries_str = _parse_countries(schedule['countries'])
     
     if validation_error:
         logger.error(f"Schedule {schedule_id} validation failed: {validation_error}")
@@ -88,14 +189,9 @@ async def execute_schedule(bot: Bot, schedule_id: int, manual_trigger: bool = Fa
         
         # Notify admins
         if not manual_trigger:
-             for aid in ADMIN_IDS:
-                try: 
-                    await bot.send_message(aid, f"⚠️ Schedule {schedule_id} Invalid: {validation_error}") 
-                except: pass
+            await _notify_admins(bot, f"⚠️ Schedule {schedule_id} Invalid: {validation_error}")
         return
 
-    countries_str = ",".join(valid_countries)
-
 
     # 4. Fetch Data
     try:
@@ -120,40 +216,19 @@ async def execute_schedule(bot: Bot, schedule_id: int, manual_trigger: bool = Fa
             
             # Notify admins of failure if not manual
             if not manual_trigger:
-                for aid in ADMIN_IDS:
-                    try:
-                        await bot.send_message(aid, f"⚠️ Schedule {schedule_id} failed: API Error.")
-                    except:
-                        pass
+                await _notify_admins(bot, f"⚠️ Schedule {schedule_id} failed: API Error.")
             return
 
         # 5. Format Messages
         messages = formatter.format_forecast_results(data)
         
         # 6. Send to Recipients (Broadcasting)
-        success_count = 0
+        # Bounded fan-out instead of a serial loop; RetryAfter is still honoured per recipient.
+        success_count, blocked = await _broadcast(bot, recipients, messages)
         
-        for chat_id in recipients:
-            try:
-                for msg in messages:
-                    await bot.send_message(chat_id, msg, parse_mode='HTML', disable_web_page_preview=True)
-                success_count += 1
-                
-                # Rate limit handling: sleep slightly between users
-                # Telegram limit: 30 msg/sec approx. 
-                # If chunked, multiple msgs per user.
-                await asyncio.sleep(0.05) 
-                
-            except Forbidden:
-                # User blocked bot
-                logger.info(f"User {chat_id} blocked bot. Deactivating.")
-                db.unsubscribe_user(chat_id)
-            except RetryAfter as e:
-                logger.warning(f"Rate limited. Sleeping {e.retry_after}s")
-                await asyncio.sleep(e.retry_after)
-                # Retry once? For now just skip to next to avoid jam.
-            except Exception as e:
-                logger.error(f"Error sending to {chat_id}: {e}")
+        # One transaction for everyone who blocked the bot during this broadcast
+        if blocked:
+            active_subscribers.remove_many(blocked)
         
         status = "success" if success_count > 0 else "partial" # simple logic
         
@@ -168,32 +243,126 @@ async def execute_schedule(bot: Bot, schedule_id: int, manual_trigger: bool = Fa
         if run_id:
             db.update_run_result(run_id, "error", error_text=str(e))
 
-def setup_scheduler(application, scheduler: AsyncIOScheduler):
-    # Load schedules from DB
+def _parse_hhmm(t: str) -> Tuple[int, int]:
+    """
+    Parses "HH:MM" with digit arithmetic; other forms (e.g. "8:00") fall back to split/int.
+    Raises ValueError on malformed input.
+    """
+    if len(t) == 5 and t[2] == ':' and all('0' <= t[i] <= '9' for i in (0, 1, 3, 4)):
+        return (ord(t[0]) - 48) * 10 + (ord(t[1]) - 48), (ord(t[3]) - 48) * 10 + (ord(t[4]) - 48)
+    hh, mm = map(int, t.split(':'))
+    return hh, mm
+
+@functools.lru_cache(maxsize=1440)
+def _cron(hh: int, mm: int) -> CronTrigger:
+    # CronTrigger is immutable, so schedules firing at the same HH:MM can share one instance
+    return CronTrigger(hour=hh, minute=mm, timezone="UTC")
+
+def _add_schedule_job(scheduler: AsyncIOScheduler, schedule: Dict[str, Any]):
+    """Adds (or replaces) the cron job for a schedule row. Raises ValueError on a malformed time."""
+    hh, mm = _parse_hhmm(schedule['time_utc'])
+    scheduler.add_job(
+        run_scheduled_job,
+        trigger=_cron(hh, mm),
+        # Snapshot of the row; run_scheduled_job compares it with the DB at fire time
+        args=[schedule],
+        id=f"schedule_{schedule['id']}",
+        replace_existing=True
+    )
+
+async def run_scheduled_job(schedule: Dict[str, Any]):
+    """
+    Entry point for scheduler jobs. Jobs live in a persistent jobstore and are pickled,
+    so they carry only the schedule snapshot; the Bot is bound by setup_scheduler.
+    The row is re-read on every fire so edits made directly in the DB apply to the next run.
+    """
+    schedule_id = schedule['id']
+    job_id = f"schedule_{schedule_id}"
+    current = db.get_schedule_by_id(schedule_id)
+
+    if current != schedule:
+        if not current or not current['enabled']:
+            logger.info(f"Schedule {schedule_id} was disabled or deleted. Removing its job.")
+            _scheduler.remove_job(job_id)
+            invalidate_schedule_cache(schedule_id)
+            return
+        if current['time_utc'] != schedule['time_utc']:
+            # Fired at the old time; re-register for the new one instead of running now
+            logger.info(f"Schedule {schedule_id} moved to {current['time_utc']} UTC. Rescheduling.")
+            try:
+                _add_schedule_job(_scheduler, current)
+            except ValueError as e:
+                logger.error(f"Failed to reschedule job {schedule_id}: {e}")
+            _schedule_cache[schedule_id] = current
+            return
+        logger.info(f"Schedule {schedule_id} changed since it was scheduled. Using the current row.")
+        _scheduler.modify_job(job_id, args=[current])
+        schedule = current
+
+    _schedule_cache[schedule_id] = current
+    await execute_schedule(_bot, schedule)
+
+def _reconcile_jobs(scheduler: AsyncIOScheduler) -> Tuple[int, int]:
+    """
+    Adds, replaces or removes schedule jobs so they match the enabled schedules in the DB.
+    Returns (scheduled_count, changed_count).
+    """
     schedules = db.get_enabled_schedules()
-    
-    # Remove existing jobs first?
-    scheduler.remove_all_jobs()
-    
-    count = 0
+
+    existing = {j.id: j for j in scheduler.get_jobs() if j.id.startswith("schedule_")}
+    wanted = set()
+
+    count = changed = 0
     for s in schedules:
+        job_id = f"schedule_{s['id']}"
+        wanted.add(job_id)
         try:
-            # Parse time HH:MM
-            hh, mm = map(int, s['time_utc'].split(':'))
-            
-            # Add Job
-            # We pass 'bot' from application.
-            # Warning: application.bot is available.
-            
-            scheduler.add_job(
-                execute_schedule,
-                trigger=CronTrigger(hour=hh, minute=mm, timezone="UTC"),
-                args=[application.bot, s['id']],
-                id=f"schedule_{s['id']}",
-                replace_existing=True
-            )
+            job = existing.get(job_id)
+            # Rows come back as fresh dicts, so the row itself serves as the job's snapshot
+            if job is not None and job.args == (s,):
+                count += 1
+                continue
+
+            _add_schedule_job(scheduler, s)
+            invalidate_schedule_cache(s['id'])
             count += 1
+            changed += 1
         except Exception as e:
             logger.error(f"Failed to schedule job {s['id']}: {e}")
-            
+
+    # Drop jobs for schedules that were deleted or disabled
+    for job_id in existing.keys() - wanted:
+        scheduler.remove_job(job_id)
+        invalidate_schedule_cache(int(job_id[len("schedule_"):]))
+        changed += 1
+
+    return count, changed
+
+async def reconcile_schedules():
+    """
+    Periodic job that picks up schedules added, edited, re-enabled or removed directly in the DB.
+    """
+    count, changed = _reconcile_jobs(_scheduler)
+    if changed:
+        logger.info(f"Schedules changed in the DB: {changed} job(s) updated, {count} scheduled.")
+
+def setup_scheduler(application, scheduler: AsyncIOScheduler):
+    """
+    Reconciles the (persistent) scheduler jobs with the enabled schedules in the DB,
+    only adding, replacing or removing jobs that differ, and registers the periodic
+    re-check. The scheduler must already be started (possibly paused) so its jobstore is loaded.
+    """
+    global _bot, _scheduler
+    _bot = application.bot
+    _scheduler = scheduler
+
+    invalidate_schedule_cache()
+    count, _ = _reconcile_jobs(scheduler)
+
+    scheduler.add_job(
+        reconcile_schedules,
+        trigger=IntervalTrigger(seconds=SCHEDULE_RECONCILE_SEC),
+        id="reconcile_schedules",
+        replace_existing=True
+    )
     logger.info(f"Loaded {count} schedules.")
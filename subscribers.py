@@ -0,0 +1,34 @@
+import logging
+from typing import List, Optional, Set
+import database as db
+
+logger = logging.getLogger(__name__)
+
+class ActiveSubscribers:
+    """
+    In-memory set of active subscriber chat_ids, so broadcasts don't query SQLite.
+    All changes go through this object, which writes them through to the database.
+    """
+
+    def __init__(self):
+        self.ids: Set[int] = set()
+
+    def load(self):
+        self.ids = set(db.iter_active_subscribers())
+        logger.info(f"Loaded {len(self.ids)} active subscribers.")
+
+    def add(self, chat_id: int, user_id: Optional[int] = None) -> bool:
+        """Returns True if new subscriber (or reactivated), False if already active."""
+        is_new = db.add_subscriber(chat_id, user_id)
+        self.ids.add(chat_id)
+        return is_new
+
+    def remove(self, chat_id: int):
+        db.unsubscribe_user(chat_id)
+        self.ids.discard(chat_id)
+
+    def remove_many(self, chat_ids: List[int]):
+        db.bulk_unsubscribe(chat_ids)
+        self.ids.difference_update(chat_ids)
+
+active_subscribers = ActiveSubscribers()